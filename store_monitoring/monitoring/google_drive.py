@@ -1,15 +1,40 @@
+import asyncio
 import os
+import threading
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, build_http
 from googleapiclient.errors import HttpError
 
+# Files above this size are sent with a chunked resumable upload
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_drive_client():
+    """
+    Get the shared GoogleDriveClient for this process.
+    It is created and initialized on first use, so credentials are only
+    loaded and the Drive service only built once.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            client = GoogleDriveClient()
+            client.initialize()
+            _client = client
+        return _client
+
 class GoogleDriveClient:
     """A client for interacting with Google Drive API."""
     
     def __init__(self, credentials_file=None):
         """Initialize the Google Drive client."""
         self.credentials_file = credentials_file or os.environ.get('GOOGLE_DRIVE_CREDENTIALS_JSON') or 'service_account.json'
+        self.credentials = None
         self.drive_service = None
     
     def initialize(self):
@@ -18,9 +43,10 @@ class GoogleDriveClient:
             raise FileNotFoundError(f"Google Drive credentials file not found: {self.credentials_file}")
         
         try:
-            credentials = service_account.Credentials.from_service_account_file(
+            self.credentials = service_account.Credentials.from_service_account_file(
                 self.credentials_file, scopes=['https://www.googleapis.com/auth/drive'])
-            self.drive_service = build('drive', 'v3', credentials=credentials)
+            # The bundled static discovery document is used, so skip the file cache
+            self.drive_service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
             return True
         except Exception as e:
             print(f"Error initializing Google Drive client: {e}")
@@ -28,7 +54,7 @@ class GoogleDriveClient:
     
     def upload_file(self, file_path, file_name=None, mime_type=None, folder_id=None):
         """
-        Upload a file to Google Drive.
+        Upload a file to Google Drive and make it viewable by anyone with the link.
         
         Arguments:
             file_path: Path to the file to upload
@@ -43,48 +69,13 @@ class GoogleDriveClient:
             if not self.initialize():
                 return None
         
-        if not os.path.exists(file_path):
-            print(f"File not found: {file_path}")
-            return None
-        
         try:
-            if not file_name:
-                file_name = os.path.basename(file_path)
-            
-            if not mime_type:
-                # Try to guess MIME type or default to text/plain
-                import mimetypes
-                mime_type = mimetypes.guess_type(file_path)[0] or 'text/plain'
-            
-            file_metadata = {
-                'name': file_name,
-                'mimeType': mime_type
-            }
-            
-            # If folder_id is provided, set parent folder
-            if folder_id:
-                file_metadata['parents'] = [folder_id]
-            
-            media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
-            
-            # Create the file
-            file = self.drive_service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id,webViewLink'
-            ).execute()
-            
-            # Make the file viewable by anyone with the link
-            self.drive_service.permissions().create(
-                fileId=file.get('id'),
-                body={'type': 'anyone', 'role': 'reader'},
-                fields='id'
-            ).execute()
+            file = self.create_file(file_path, file_name, mime_type, folder_id)
+            if not file:
+                return None
             
-            return {
-                'id': file.get('id'),
-                'link': file.get('webViewLink')
-            }
+            self.share_file(file['id'])
+            return file
         
         except HttpError as e:
             print(f"Google Drive API error: {e}")
@@ -93,6 +84,108 @@ class GoogleDriveClient:
             print(f"Error uploading file to Google Drive: {e}")
             return None
     
+    def create_file(self, file_path, file_name=None, mime_type=None, folder_id=None):
+        """
+        Upload a file to Google Drive without sharing it.
+        Takes the same arguments as upload_file. HttpError is raised so
+        callers can inspect the status and retry.
+        
+        Returns:
+            Dictionary with file ID and webViewLink if successful, None if
+            the client could not be initialized or the file does not exist
+        """
+        if not self.drive_service:
+            if not self.initialize():
+                return None
+        
+        if not os.path.exists(file_path):
+            print(f"File not found: {file_path}")
+            return None
+        
+        if not file_name:
+            file_name = os.path.basename(file_path)
+        
+        if not mime_type:
+            # Try to guess MIME type or default to text/plain
+            import mimetypes
+            mime_type = mimetypes.guess_type(file_path)[0] or 'text/plain'
+        
+        file_metadata = {
+            'name': file_name,
+            'mimeType': mime_type
+        }
+        
+        # If folder_id is provided, set parent folder
+        if folder_id:
+            file_metadata['parents'] = [folder_id]
+        
+        # Resumable uploads cost extra round-trips, so small reports go in one request
+        resumable = os.path.getsize(file_path) > RESUMABLE_THRESHOLD
+        media = MediaFileUpload(file_path, mimetype=mime_type, resumable=resumable, chunksize=UPLOAD_CHUNK_SIZE)
+        
+        file = self.drive_service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id,webViewLink'
+        ).execute(http=self._authorized_http())
+        
+        return {
+            'id': file.get('id'),
+            'link': file.get('webViewLink')
+        }
+    
+    def share_file(self, file_id):
+        """
+        Make a Drive file viewable by anyone with the link.
+        HttpError is raised so callers can inspect the status and retry.
+        """
+        if not self.drive_service:
+            if not self.initialize():
+                return None
+        
+        return self.drive_service.permissions().create(
+            fileId=file_id,
+            body={'type': 'anyone', 'role': 'reader'},
+            fields='id'
+        ).execute(http=self._authorized_http())
+    
+    def _authorized_http(self):
+        """
+        Build a new authorized connection for one request.
+        httplib2 is not thread-safe, so requests don't share connections;
+        build_http sets a socket timeout and stops 308 from being followed
+        as a redirect, which resumable uploads rely on.
+        """
+        return AuthorizedHttp(self.credentials, http=build_http())
+    
+    async def upload_many(self, file_paths, mime_type=None, folder_id=None):
+        """
+        Upload several files to Google Drive concurrently.
+        
+        Arguments:
+            file_paths: Paths of the files to upload
+            mime_type: MIME type applied to every file (auto-detected if not provided)
+            folder_id: ID of the folder to upload to (root if not provided)
+            
+        Returns:
+            List with the upload_file result for each path, in the same order
+        """
+        if not self.drive_service:
+            if not self.initialize():
+                return [None] * len(file_paths)
+        
+        # upload_file blocks on network I/O, so run each one in a worker thread
+        return await asyncio.gather(*(
+            asyncio.to_thread(self.upload_file, file_path, mime_type=mime_type, folder_id=folder_id)
+            for file_path in file_paths
+        ))
+    
+    def upload_files(self, file_paths, mime_type=None, folder_id=None):
+        """
+        Blocking wrapper around upload_many for synchronous callers.
+        """
+        return asyncio.run(self.upload_many(file_paths, mime_type=mime_type, folder_id=folder_id))
+    
     def create_folder(self, folder_name, parent_folder_id=None):
         """
         Create a folder in Google Drive.
@@ -1,12 +1,38 @@
-import pandas as pd
+import csv
+import ciso8601
+from itertools import islice
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import connection, transaction
 from monitoring.models import StoreStatus, BusinessHours, StoreTimezone
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
+
+@lru_cache(maxsize=65536)
+def parse_utc_timestamp(timestamp_str):
+    """
+    Parse a UTC timestamp such as '2023-01-22 12:09:39.388884 UTC'.
+    Bounded cache: repeats cluster within nearby rows, and most
+    microsecond-precision strings are unique, so an unbounded memo would
+    grow with the file.
+    """
+    timestamp = ciso8601.parse_datetime(timestamp_str.removesuffix(' UTC'))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+def get_batch_size():
+    """Rows per INSERT statement for bulk_create on the current backend."""
+    return 500 if connection.vendor == 'postgresql' else 100
 
 class Command(BaseCommand):
     help = 'Import data from CSV files into the database'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Business hours only use a handful of HH:MM:SS values, so parsed
+        # times are memoized by their raw string
+        self._time_cache = {}
+
     def add_arguments(self, parser):
         parser.add_argument('--status-file', type=str, default='store_status.csv',
                             help='Path to the store status CSV file')
@@ -24,33 +50,69 @@ class Command(BaseCommand):
     
     def parse_time(self, time_str):
         """Parse time string in HH:MM:SS format."""
-        return datetime.strptime(time_str, '%H:%M:%S').time()
+        parsed = self._time_cache.get(time_str)
+        if parsed is None:
+            parsed = datetime.strptime(time_str, '%H:%M:%S').time()
+            self._time_cache[time_str] = parsed
+        return parsed
     
-    @transaction.atomic
-    def import_data(self, status_file, hours_file, timezone_file):
-        self.stdout.write(self.style.SUCCESS('Starting data import...'))
+    def parse_timestamp(self, timestamp_str):
+        """Parse a UTC timestamp such as '2023-01-22 12:09:39.388884 UTC'."""
+        return parse_utc_timestamp(timestamp_str)
+    
+    def copy_store_status(self, status_file):
+        """
+        Stream the status CSV straight into Postgres with COPY, letting the
+        database parse the rows instead of building model instances.
+        """
+        table = StoreStatus._meta.db_table
+        expected_columns = {'store_id', 'timestamp_utc', 'status'}
         
-        # Import store status data
-        try:
-            self.stdout.write('Importing store status data...')
-            status_df = pd.read_csv(status_file)
+        with open(status_file, newline='') as f:
+            # Use the header to map CSV columns onto table columns
+            columns = next(csv.reader([f.readline()]))
+            if set(columns) != expected_columns:
+                raise ValueError(f"Unexpected columns in {status_file}: {columns}")
             
-            # Process in chunks to avoid memory issues
-            chunk_size = 10000
-            for i in range(0, len(status_df), chunk_size):
-                chunk = status_df.iloc[i:i+chunk_size]
-                
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH CSV", f)
+                self.stdout.write(f'Imported {cursor.rowcount} status records')
+    
+    def bulk_create_store_status(self, status_file):
+        """Load the status CSV through the ORM in chunks."""
+        chunk_size = 10000
+        imported = 0
+        
+        # Stream the file so memory stays bounded regardless of its size
+        with open(status_file, newline='') as f:
+            reader = csv.DictReader(f)
+            for chunk in iter(lambda: list(islice(reader, chunk_size)), []):
                 status_objects = [
                     StoreStatus(
                         store_id=row['store_id'],
-                        timestamp_utc=pd.to_datetime(row['timestamp_utc']),
+                        timestamp_utc=self.parse_timestamp(row['timestamp_utc']),
                         status=row['status']
                     )
-                    for _, row in chunk.iterrows()
+                    for row in chunk
                 ]
                 
-                StoreStatus.objects.bulk_create(status_objects)
-                self.stdout.write(f'Imported {i+len(chunk)}/{len(status_df)} status records')
+                with transaction.atomic():
+                    StoreStatus.objects.bulk_create(status_objects, batch_size=get_batch_size())
+                imported += len(chunk)
+                self.stdout.write(f'Imported {imported} status records')
+    
+    @transaction.atomic
+    def import_data(self, status_file, hours_file, timezone_file):
+        self.stdout.write(self.style.SUCCESS('Starting data import...'))
+        
+        # Import store status data
+        try:
+            self.stdout.write('Importing store status data...')
+            if connection.vendor == 'postgresql':
+                self.copy_store_status(status_file)
+            else:
+                self.bulk_create_store_status(status_file)
             
             self.stdout.write(self.style.SUCCESS('Successfully imported store status data'))
         except Exception as e:
@@ -59,19 +121,18 @@ class Command(BaseCommand):
         # Import business hours data
         try:
             self.stdout.write('Importing business hours data...')
-            hours_df = pd.read_csv(hours_file)
-            
-            hours_objects = [
-                BusinessHours(
-                    store_id=row['store_id'],
-                    day_of_week=row['dayOfWeek'],
-                    start_time_local=self.parse_time(row['start_time_local']),
-                    end_time_local=self.parse_time(row['end_time_local'])
-                )
-                for _, row in hours_df.iterrows()
-            ]
+            with open(hours_file, newline='') as f:
+                hours_objects = [
+                    BusinessHours(
+                        store_id=row['store_id'],
+                        day_of_week=int(row['dayOfWeek']),
+                        start_time_local=self.parse_time(row['start_time_local']),
+                        end_time_local=self.parse_time(row['end_time_local'])
+                    )
+                    for row in csv.DictReader(f)
+                ]
             
-            BusinessHours.objects.bulk_create(hours_objects)
+            BusinessHours.objects.bulk_create(hours_objects, batch_size=get_batch_size())
             self.stdout.write(self.style.SUCCESS('Successfully imported business hours data'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error importing business hours data: {e}'))
@@ -79,17 +140,13 @@ class Command(BaseCommand):
         # Import timezone data
         try:
             self.stdout.write('Importing timezone data...')
-            timezone_df = pd.read_csv(timezone_file)
-            
-            timezone_objects = [
-                StoreTimezone(
-                    store_id=row['store_id'],
-                    timezone_str=row['timezone_str']
-                )
-                for _, row in timezone_df.iterrows()
-            ]
+            with open(timezone_file, newline='') as f:
+                timezone_objects = [
+                    StoreTimezone(store_id=row['store_id'], timezone_str=row['timezone_str'])
+                    for row in csv.DictReader(f)
+                ]
             
-            StoreTimezone.objects.bulk_create(timezone_objects)
+            StoreTimezone.objects.bulk_create(timezone_objects, batch_size=get_batch_size())
             self.stdout.write(self.style.SUCCESS('Successfully imported timezone data'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error importing timezone data: {e}'))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.10 on 2026-10-14 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='storestatus',
+            name='monitoring__store_i_3226e3_idx',
+        ),
+        migrations.AddIndex(
+            model_name='storestatus',
+            index=models.Index(fields=['store_id', 'timestamp_utc'], include=('status',), name='ss_sid_ts_stat_idx'),
+        ),
+    ]
@@ -9,7 +9,8 @@ class StoreStatus(models.Model):
     
     class Meta:
         indexes = [
-            models.Index(fields=['store_id', 'timestamp_utc']),
+            # Covers the report range scans so status is read from the index
+            models.Index(fields=['store_id', 'timestamp_utc'], include=['status'], name='ss_sid_ts_stat_idx'),
         ]
 
 class BusinessHours(models.Model):
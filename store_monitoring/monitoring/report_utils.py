@@ -1,74 +1,153 @@
+import csv
+import multiprocessing
+import os
+import numpy as np
 import pandas as pd
 import pytz
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime, timedelta, time
+from functools import lru_cache
+import django
+from django.db import connections
 from django.db.models import Avg, Count, Q, F, Min, Max
 from .models import StoreStatus, BusinessHours, StoreTimezone
 
-def get_store_business_hours(store_id, date):
+EPOCH = datetime(1970, 1, 1, tzinfo=pytz.UTC)
+DEFAULT_TIMEZONE = 'America/Chicago'
+
+# Observations are held as (nanoseconds since epoch, is_active) records
+OBSERVATION_DTYPE = [('t', 'i8'), ('s', '?')]
+
+REPORT_FIELDS = [
+    'store_id',
+    'uptime_last_hour',
+    'uptime_last_day',
+    'uptime_last_week',
+    'downtime_last_hour',
+    'downtime_last_day',
+    'downtime_last_week',
+]
+
+def to_nanoseconds(dt):
+    """Convert a timezone-aware datetime to integer nanoseconds since the epoch."""
+    return (dt - EPOCH) // timedelta(microseconds=1) * 1000
+
+def from_nanoseconds(ns):
+    """Convert integer nanoseconds since the epoch to a UTC datetime."""
+    return EPOCH + timedelta(microseconds=int(ns) // 1000)
+
+@lru_cache(maxsize=1024)
+def get_timezone(tz_str):
+    """Get the pytz timezone for tz_str, cached since stores share a few zones."""
+    return pytz.timezone(tz_str)
+
+def get_store_timezone(store_id, tz_map=None):
     """
-    Get business hours for a store on a specific date.
-    Returns a list of (start_datetime, end_datetime) tuples in UTC.
-    If no business hours are defined, assumes 24/7 operation.
+    Get the timezone string for a store, defaulting to America/Chicago.
+    Uses tz_map (store_id -> timezone_str) when provided instead of the database.
     """
-    # Get store timezone
+    if tz_map is not None:
+        return tz_map.get(store_id, DEFAULT_TIMEZONE)
+    
     try:
-        tz_str = StoreTimezone.objects.get(store_id=store_id).timezone_str
+        return StoreTimezone.objects.get(store_id=store_id).timezone_str
     except StoreTimezone.DoesNotExist:
-        tz_str = 'America/Chicago'
-    
-    store_tz = pytz.timezone(tz_str)
-    utc_tz = pytz.UTC
-    
-    # Get day of week (0=Monday, 6=Sunday)
-    local_date = date.astimezone(store_tz).date()
-    day_of_week = local_date.weekday()
-    
-    # Get business hours for this day
-    business_hours = BusinessHours.objects.filter(store_id=store_id, day_of_week=day_of_week)
+        return DEFAULT_TIMEZONE
+
+def get_day_hours(store_id, day_of_week, bh_map=None):
+    """
+    Get a store's business hours for a day of the week (0=Monday, 6=Sunday)
+    as a tuple of (start_time_local, end_time_local) pairs.
+    Uses bh_map (see load_store_metadata) when provided instead of the database.
+    """
+    if bh_map is not None:
+        return bh_map.get(store_id, {}).get(day_of_week, ())
     
-    if not business_hours.exists():
+    return tuple(BusinessHours.objects.filter(
+        store_id=store_id, day_of_week=day_of_week
+    ).values_list('start_time_local', 'end_time_local'))
+
+def local_business_hours(hours, local_date):
+    """
+    Get the local wall-clock (start_datetime, end_datetime) pairs of business
+    hours on local_date. If no business hours are defined, assumes 24/7 operation.
+    """
+    if not hours:
         # No business hours defined, assume 24/7
-        start_dt = datetime.combine(local_date, time(0, 0))
-        end_dt = datetime.combine(local_date, time(23, 59, 59))
-        
-        # Localize to store timezone, then convert to UTC
-        start_dt = store_tz.localize(start_dt).astimezone(utc_tz)
-        end_dt = store_tz.localize(end_dt).astimezone(utc_tz)
-        
-        return [(start_dt, end_dt)]
+        return [(datetime.combine(local_date, time(0, 0)), datetime.combine(local_date, time(23, 59, 59)))]
     
-    # Process each business hours record
     result = []
-    for bh in business_hours:
-        start_dt = datetime.combine(local_date, bh.start_time_local)
-        end_dt = datetime.combine(local_date, bh.end_time_local)
+    for start_time_local, end_time_local in hours:
+        start_dt = datetime.combine(local_date, start_time_local)
+        end_dt = datetime.combine(local_date, end_time_local)
         
         # Handle business hours spanning midnight
-        if bh.end_time_local < bh.start_time_local:
+        if end_time_local < start_time_local:
             end_dt += timedelta(days=1)
         
-        # Localize to store timezone, then convert to UTC
-        start_dt = store_tz.localize(start_dt).astimezone(utc_tz)
-        end_dt = store_tz.localize(end_dt).astimezone(utc_tz)
-        
         result.append((start_dt, end_dt))
     
     return result
 
-def get_time_intervals_in_range(store_id, start_time, end_time):
+def localize_to_utc_ns(local_datetimes, store_tz):
     """
-    Get all business hours intervals between start_time and end_time for a store.
+    Convert naive local datetimes in store_tz to UTC nanoseconds in one vectorized call.
+    Ambiguous times resolve to standard time and non-existent times move
+    forward an hour, matching pytz's localize() defaults.
+    """
+    local_index = pd.DatetimeIndex(local_datetimes)
+    return local_index.tz_localize(
+        store_tz,
+        ambiguous=np.zeros(len(local_index), dtype=bool),
+        nonexistent=timedelta(hours=1)
+    ).tz_convert('UTC').asi8
+
+@lru_cache(maxsize=100000)
+def business_hours_to_utc_ns(tz_str, hours, local_date):
+    """
+    Convert one local day's business hours to UTC.
+    Returns a tuple of (start_ns, end_ns) pairs in UTC nanoseconds since the
+    epoch. The result only depends on the arguments, so it is cached and
+    shared by stores with the same timezone and hours across all report
+    windows; pandas is only called on a cache miss.
+    """
+    local_hours = local_business_hours(hours, local_date)
+    boundaries = localize_to_utc_ns(
+        [start for start, _ in local_hours] + [end for _, end in local_hours],
+        get_timezone(tz_str)
+    ).tolist()
+    count = len(local_hours)
+    return tuple(zip(boundaries[:count], boundaries[count:]))
+
+def get_store_business_hours(store_id, date, tz_map=None, bh_map=None):
+    """
+    Get business hours for a store on a specific date.
     Returns a list of (start_datetime, end_datetime) tuples in UTC.
+    If no business hours are defined, assumes 24/7 operation.
+    tz_map and bh_map (see load_store_metadata) replace the database
+    lookups when provided.
     """
-    intervals = []
+    tz_str = get_store_timezone(store_id, tz_map)
+    store_tz = get_timezone(tz_str)
     
-    # Get store timezone
-    try:
-        tz_str = StoreTimezone.objects.get(store_id=store_id).timezone_str
-    except StoreTimezone.DoesNotExist:
-        tz_str = 'America/Chicago'
+    # Get day of week (0=Monday, 6=Sunday)
+    local_date = date.astimezone(store_tz).date()
+    hours = get_day_hours(store_id, local_date.weekday(), bh_map)
     
-    store_tz = pytz.timezone(tz_str)
+    return [
+        (from_nanoseconds(start), from_nanoseconds(end))
+        for start, end in business_hours_to_utc_ns(tz_str, hours, local_date)
+    ]
+
+def get_time_intervals_in_range(store_id, start_time, end_time, tz_map=None, bh_map=None):
+    """
+    Get all business hours intervals between start_time and end_time for a store.
+    Returns (starts, ends) int64 arrays of UTC nanoseconds since the epoch.
+    """
+    tz_str = get_store_timezone(store_id, tz_map)
+    store_tz = get_timezone(tz_str)
     
     # Convert to timezone-aware UTC
     if start_time.tzinfo is None:
@@ -80,106 +159,175 @@ def get_time_intervals_in_range(store_id, start_time, end_time):
     start_date_local = start_time.astimezone(store_tz).date()
     end_date_local = end_time.astimezone(store_tz).date()
     
-    # Process each day in the range
+    # Collect the UTC business hours of each day in the range
+    intervals = []
     current_date = start_date_local
     while current_date <= end_date_local:
-        # Get business hours for this date
-        for bh_start, bh_end in get_store_business_hours(store_id, store_tz.localize(datetime.combine(current_date, time(12, 0)))):
-            # Check if this business hours interval overlaps with our time range
-            if bh_end > start_time and bh_start < end_time:
-                # Calculate overlap
-                overlap_start = max(bh_start, start_time)
-                overlap_end = min(bh_end, end_time)
-                intervals.append((overlap_start, overlap_end))
+        hours = get_day_hours(store_id, current_date.weekday(), bh_map)
+        intervals.extend(business_hours_to_utc_ns(tz_str, hours, current_date))
         
         current_date += timedelta(days=1)
     
-    return intervals
+    bounds = np.array(intervals, dtype=np.int64).reshape(-1, 2)
+    starts = bounds[:, 0]
+    ends = bounds[:, 1]
+    
+    # Keep the intervals overlapping our time range, clipped to it
+    start_ns = to_nanoseconds(start_time)
+    end_ns = to_nanoseconds(end_time)
+    overlapping = (ends > start_ns) & (starts < end_ns)
+    
+    return np.maximum(starts[overlapping], start_ns), np.minimum(ends[overlapping], end_ns)
 
-def calculate_uptime_downtime(store_id, start_time, end_time):
+def calculate_uptime_downtime(store_id, start_time, end_time, observations=None, tz_map=None, bh_map=None):
     """
     Calculate uptime and downtime for a store between start_time and end_time.
     Only considers time within business hours.
     Uses interpolation to fill gaps between observations.
+    observations may be a preloaded OBSERVATION_DTYPE array for the store
+    covering at least this range; otherwise it is fetched from the database.
     """
     # Get all business hours intervals in the time range
-    business_intervals = get_time_intervals_in_range(store_id, start_time, end_time)
+    starts, ends = get_time_intervals_in_range(store_id, start_time, end_time, tz_map, bh_map)
     
     # Calculate total business hours
-    total_business_seconds = sum((end - start).total_seconds() for start, end in business_intervals)
+    total_business_seconds = int((ends - starts).sum()) / 1e9
     
     # If no business hours in range, return zeros
     if total_business_seconds == 0:
-        return 0, 0
+        return 0.0, 0.0
     
-    # Get observations within the time range
-    observations = StoreStatus.objects.filter(
-        store_id=store_id,
-        timestamp_utc__gte=start_time,
-        timestamp_utc__lte=end_time
-    ).order_by('timestamp_utc')
+    if observations is None:
+        # Fetch the observations once as (nanoseconds, is_active) records
+        rows = StoreStatus.objects.filter(
+            store_id=store_id,
+            timestamp_utc__gte=start_time,
+            timestamp_utc__lte=end_time
+        ).order_by('timestamp_utc').values_list('timestamp_utc', 'status')
+        observations = np.fromiter(
+            ((to_nanoseconds(ts), status == 'active') for ts, status in rows.iterator()),
+            dtype=OBSERVATION_DTYPE
+        )
+    else:
+        # Narrow the preloaded observations down to this time range
+        lo = np.searchsorted(observations['t'], to_nanoseconds(start_time), side='left')
+        hi = np.searchsorted(observations['t'], to_nanoseconds(end_time), side='right')
+        observations = observations[lo:hi]
     
     # If no observations, assume store was operating normally (uptime)
-    if not observations.exists():
+    if len(observations) == 0:
         total_business_minutes = total_business_seconds / 60
-        return total_business_minutes, 0
+        return total_business_minutes, 0.0
     
-    # Process observations
-    uptime_seconds = 0
-    downtime_seconds = 0
+    uptime_seconds, downtime_seconds = accumulate_uptime_downtime(observations, starts, ends)
     
-    for interval_start, interval_end in business_intervals:
-        # Get observations within this business hours interval
-        interval_obs = observations.filter(
-            timestamp_utc__gte=interval_start,
-            timestamp_utc__lte=interval_end
-        )
-        
-        if not interval_obs.exists():
+    # Convert to minutes
+    uptime_minutes = uptime_seconds / 60
+    downtime_minutes = downtime_seconds / 60
+    
+    return uptime_minutes, downtime_minutes
+
+def accumulate_uptime_downtime(observations, starts, ends):
+    """
+    Sum uptime and downtime seconds over business hours intervals given as
+    arrays of start and end nanoseconds since the epoch.
+    observations is a structured array of ('t', ns since epoch) and
+    ('s', is_active) sorted by time. Each observation's status is carried
+    forward until the next one, and the first/last observation in an
+    interval is extrapolated to the interval edges.
+    """
+    timestamps = observations['t']
+    active = observations['s']
+    uptime_ns = 0
+    downtime_ns = 0
+    
+    # Locate every interval's slice of observations in two vectorized searches
+    los = np.searchsorted(timestamps, starts, side='left')
+    his = np.searchsorted(timestamps, ends, side='right')
+    
+    for start_ns, end_ns, lo, hi in zip(starts.tolist(), ends.tolist(), los.tolist(), his.tolist()):
+        if lo == hi:
             # No observations in this interval, assume uptime
-            uptime_seconds += (interval_end - interval_start).total_seconds()
+            uptime_ns += end_ns - start_ns
             continue
         
-        # Get first and last observation in this interval
-        first_obs = interval_obs.first()
-        last_obs = interval_obs.last()
+        interval_times = timestamps[lo:hi]
+        interval_active = active[lo:hi]
         
-        # Handle time before first observation
-        if first_obs.timestamp_utc > interval_start:
-            # For the first interval of the day, extrapolate from the first observation
-            if first_obs.status == 'active':
-                uptime_seconds += (first_obs.timestamp_utc - interval_start).total_seconds()
-            else:
-                downtime_seconds += (first_obs.timestamp_utc - interval_start).total_seconds()
+        # Time before the first observation and after the last one
+        lead_ns = int(interval_times[0]) - start_ns
+        tail_ns = end_ns - int(interval_times[-1])
         
-        # Process pairs of observations
-        prev_obs = None
-        for obs in interval_obs:
-            if prev_obs is not None:
-                time_diff = (obs.timestamp_utc - prev_obs.timestamp_utc).total_seconds()
-                if prev_obs.status == 'active':
-                    uptime_seconds += time_diff
-                else:
-                    downtime_seconds += time_diff
-            prev_obs = obs
+        # Each gap between observations takes the status of its earlier end
+        gaps = np.diff(interval_times)
+        gap_uptime = int(gaps[interval_active[:-1]].sum())
+        gap_downtime = int(gaps.sum()) - gap_uptime
         
-        # Handle time after last observation
-        if last_obs.timestamp_utc < interval_end:
-            # Extrapolate from the last observation
-            if last_obs.status == 'active':
-                uptime_seconds += (interval_end - last_obs.timestamp_utc).total_seconds()
-            else:
-                downtime_seconds += (interval_end - last_obs.timestamp_utc).total_seconds()
+        uptime_ns += gap_uptime
+        downtime_ns += gap_downtime
+        if interval_active[0]:
+            uptime_ns += lead_ns
+        else:
+            downtime_ns += lead_ns
+        if interval_active[-1]:
+            uptime_ns += tail_ns
+        else:
+            downtime_ns += tail_ns
     
-    # Convert to minutes
-    uptime_minutes = uptime_seconds / 60
-    downtime_minutes = downtime_seconds / 60
+    return uptime_ns / 1e9, downtime_ns / 1e9
+
+def load_observations(start_time, end_time):
+    """
+    Load every store's observations between start_time and end_time in one query.
+    Returns a dict of store_id -> OBSERVATION_DTYPE array sorted by time.
+    """
+    rows = StoreStatus.objects.filter(
+        timestamp_utc__gte=start_time,
+        timestamp_utc__lte=end_time
+    ).order_by('store_id', 'timestamp_utc').values_list('store_id', 'timestamp_utc', 'status')
     
-    return uptime_minutes, downtime_minutes
+    df = pd.DataFrame.from_records(rows.iterator(chunk_size=50000), columns=['store_id', 'timestamp_utc', 'status'])
+    if df.empty:
+        return {}
+    
+    df['t'] = pd.to_datetime(df['timestamp_utc'], utc=True).astype('int64')
+    df['s'] = df['status'] == 'active'
+    
+    observations = {}
+    for store_id, group in df.groupby('store_id', sort=False):
+        records = np.empty(len(group), dtype=OBSERVATION_DTYPE)
+        records['t'] = group['t'].to_numpy()
+        records['s'] = group['s'].to_numpy()
+        observations[store_id] = records
+    
+    return observations
+
+def load_store_metadata():
+    """
+    Load every store's timezone and business hours in two queries.
+    Returns (tz_map, bh_map) where tz_map is store_id -> timezone_str and
+    bh_map is store_id -> {day_of_week: ((start_time_local, end_time_local), ...)}.
+    """
+    tz_map = dict(StoreTimezone.objects.values_list('store_id', 'timezone_str'))
+    
+    hours_by_day = defaultdict(lambda: defaultdict(list))
+    rows = BusinessHours.objects.values_list('store_id', 'day_of_week', 'start_time_local', 'end_time_local')
+    for store_id, day_of_week, start_time_local, end_time_local in rows.iterator():
+        hours_by_day[store_id][day_of_week].append((start_time_local, end_time_local))
+    
+    # Plain dicts of tuples pickle cheaply and are ready to use as cache keys
+    bh_map = {
+        store_id: {day_of_week: tuple(hours) for day_of_week, hours in days.items()}
+        for store_id, days in hours_by_day.items()
+    }
+    
+    return tz_map, bh_map
 
-def generate_store_report(store_id, current_time):
+def generate_store_report(store_id, current_time, observations=None, tz_map=None, bh_map=None):
     """
     Generate uptime/downtime report for a single store.
+    observations, tz_map and bh_map are passed through to
+    calculate_uptime_downtime to avoid per-store queries.
     """
     # Define time intervals
     hour_ago = current_time - timedelta(hours=1)
@@ -187,9 +335,9 @@ def generate_store_report(store_id, current_time):
     week_ago = current_time - timedelta(weeks=1)
     
     # Calculate metrics for different time intervals
-    uptime_hour, downtime_hour = calculate_uptime_downtime(store_id, hour_ago, current_time)
-    uptime_day, downtime_day = calculate_uptime_downtime(store_id, day_ago, current_time)
-    uptime_week, downtime_week = calculate_uptime_downtime(store_id, week_ago, current_time)
+    uptime_hour, downtime_hour = calculate_uptime_downtime(store_id, hour_ago, current_time, observations, tz_map, bh_map)
+    uptime_day, downtime_day = calculate_uptime_downtime(store_id, day_ago, current_time, observations, tz_map, bh_map)
+    uptime_week, downtime_week = calculate_uptime_downtime(store_id, week_ago, current_time, observations, tz_map, bh_map)
     
     # Convert to hours for day and week metrics
     uptime_day_hours = uptime_day / 60
@@ -207,6 +355,37 @@ def generate_store_report(store_id, current_time):
         'downtime_last_week': round(downtime_week_hours, 2)
     }
 
+def empty_store_report(store_id):
+    """
+    Report row with zeros, used when a store could not be processed.
+    """
+    return {
+        'store_id': store_id,
+        'uptime_last_hour': 0.0,
+        'uptime_last_day': 0.0,
+        'uptime_last_week': 0.0,
+        'downtime_last_hour': 0.0,
+        'downtime_last_day': 0.0,
+        'downtime_last_week': 0.0
+    }
+
+def compute_store_report(store_input):
+    """
+    Process pool entry point for a single store.
+    store_input is a picklable (store_id, current_time, observations,
+    tz_str, hours) tuple, so no Django models or queries are needed here.
+    """
+    store_id, current_time, observations, tz_str, hours = store_input
+    tz_map = {store_id: tz_str} if tz_str else {}
+    bh_map = {store_id: hours}
+    
+    try:
+        return generate_store_report(store_id, current_time, observations, tz_map, bh_map)
+    except Exception as e:
+        print(f"Error processing store {store_id}: {e}")
+        # Add a record with zeros for this store to ensure it's included in the report
+        return empty_store_report(store_id)
+
 def optimize_report_generation(report_id):
     """
     Optimized report generation that processes stores in batches
@@ -214,7 +393,6 @@ def optimize_report_generation(report_id):
     """
     from .models import Report
     import time as time_module
-    import pandas as pd
     
     try:
         report = Report.objects.get(id=report_id)
@@ -224,41 +402,55 @@ def optimize_report_generation(report_id):
         if not current_time:
             current_time = datetime.now(pytz.UTC)
         
-        # Get all unique store IDs
-        store_ids = StoreStatus.objects.values_list('store_id', flat=True).distinct()
+        # Get all unique store IDs, materialized once so the total is known up front
+        store_ids = list(StoreStatus.objects.values_list('store_id', flat=True).distinct())
+        
+        # Load everything the report needs up front so stores are processed from memory
+        week_ago = current_time - timedelta(weeks=1)
+        observations = load_observations(week_ago, current_time)
+        no_observations = np.empty(0, dtype=OBSERVATION_DTYPE)
+        tz_map, bh_map = load_store_metadata()
         
-        # Process stores in batches
+        # Progress is reported every batch_size stores
         batch_size = 100
-        results = []
         total_stores = len(store_ids)
+        file_path = report.get_file_path()
         
-        for i in range(0, total_stores, batch_size):
-            batch = list(store_ids)[i:i+batch_size]
-            
-            # Process each store in the batch
-            for store_id in batch:
-                try:
-                    store_report = generate_store_report(store_id, current_time)
-                    results.append(store_report)
-                except Exception as e:
-                    print(f"Error processing store {store_id}: {e}")
-                    # Add a record with zeros for this store to ensure it's included in the report
-                    results.append({
-                        'store_id': store_id,
-                        'uptime_last_hour': 0,
-                        'uptime_last_day': 0,
-                        'uptime_last_week': 0,
-                        'downtime_last_hour': 0,
-                        'downtime_last_day': 0,
-                        'downtime_last_week': 0
-                    })
+        store_inputs = (
+            (store_id, current_time, observations.get(store_id, no_observations),
+             tz_map.get(store_id), bh_map.get(store_id, {}))
+            for store_id in store_ids
+        )
+        
+        # Rows are written to the CSV as they arrive rather than buffered
+        with ExitStack() as stack:
+            report_file = stack.enter_context(open(file_path, 'w', newline=''))
+            writer = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS, lineterminator='\n')
+            writer.writeheader()
             
-            print(f"Processed {min(i+batch_size, total_stores)}/{total_stores} stores")
+            if multiprocessing.current_process().daemon:
+                # Celery's prefork workers are daemonic and may not start
+                # child processes, so compute the stores in-process there
+                rows = map(compute_store_report, store_inputs)
+            else:
+                # Store computation is CPU-bound, so spread it across processes.
+                # One map over every store keeps all workers busy; a few chunks
+                # per worker balance uneven stores without much pickling overhead.
+                workers = os.cpu_count() or 1
+                chunksize = max(1, total_stores // (workers * 4))
+                
+                # Forked workers must not share the parent's database connections.
+                # Spawned or forkserver workers start from a fresh interpreter, so
+                # Django is set up before compute_store_report is unpickled.
+                connections.close_all()
+                executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers, initializer=django.setup))
+                rows = executor.map(compute_store_report, store_inputs, chunksize=chunksize)
             
-        # Create DataFrame and save to CSV
-        df = pd.DataFrame(results)
-        file_path = report.get_file_path()
-        df.to_csv(file_path, index=False)
+            for processed, row in enumerate(rows, 1):
+                writer.writerow(row)
+                
+                if processed % batch_size == 0 or processed == total_stores:
+                    print(f"Processed {processed}/{total_stores} stores")
         
         # Upload to Google Drive
         from .utils import upload_to_google_drive
@@ -1,6 +1,9 @@
-import pandas as pd
+import csv
+from datetime import datetime
+from itertools import islice
 from django.db import transaction
 from django.core.management.base import BaseCommand
+from monitoring.management.commands.import_data import get_batch_size, parse_utc_timestamp
 from monitoring.models import StoreStatus, BusinessHours, StoreTimezone
 
 class Command(BaseCommand):
@@ -16,24 +19,25 @@ class Command(BaseCommand):
         # Import store status data
         try:
             self.stdout.write('Importing store status data...')
-            status_df = pd.read_csv('store_status.csv')
-            
-            # Process in chunks to avoid memory issues
+            # Stream the file in chunks to avoid memory issues
             chunk_size = 10000
-            for i in range(0, len(status_df), chunk_size):
-                chunk = status_df.iloc[i:i+chunk_size]
-                
-                status_objects = [
-                    StoreStatus(
-                        store_id=row['store_id'],
-                        timestamp_utc=pd.to_datetime(row['timestamp_utc']),
-                        status=row['status']
-                    )
-                    for _, row in chunk.iterrows()
-                ]
-                
-                StoreStatus.objects.bulk_create(status_objects)
-                self.stdout.write(f'Imported {i+len(chunk)}/{len(status_df)} status records')
+            imported = 0
+            with open('store_status.csv', newline='') as f:
+                reader = csv.DictReader(f)
+                for chunk in iter(lambda: list(islice(reader, chunk_size)), []):
+                    status_objects = [
+                        StoreStatus(
+                            store_id=row['store_id'],
+                            timestamp_utc=self.parse_timestamp(row['timestamp_utc']),
+                            status=row['status']
+                        )
+                        for row in chunk
+                    ]
+                    
+                    with transaction.atomic():
+                        StoreStatus.objects.bulk_create(status_objects, batch_size=get_batch_size())
+                    imported += len(chunk)
+                    self.stdout.write(f'Imported {imported} status records')
             
             self.stdout.write(self.style.SUCCESS('Successfully imported store status data'))
         except Exception as e:
@@ -42,19 +46,18 @@ class Command(BaseCommand):
         # Import business hours data
         try:
             self.stdout.write('Importing business hours data...')
-            hours_df = pd.read_csv('business_hours.csv')
-            
-            hours_objects = [
-                BusinessHours(
-                    store_id=row['store_id'],
-                    day_of_week=row['day_of_week'],
-                    start_time_local=self.parse_time(row['start_time_local']),
-                    end_time_local=self.parse_time(row['end_time_local'])
-                )
-                for _, row in hours_df.iterrows()
-            ]
+            with open('business_hours.csv', newline='') as f:
+                hours_objects = [
+                    BusinessHours(
+                        store_id=row['store_id'],
+                        day_of_week=int(row['day_of_week']),
+                        start_time_local=self.parse_time(row['start_time_local']),
+                        end_time_local=self.parse_time(row['end_time_local'])
+                    )
+                    for row in csv.DictReader(f)
+                ]
             
-            BusinessHours.objects.bulk_create(hours_objects)
+            BusinessHours.objects.bulk_create(hours_objects, batch_size=get_batch_size())
             self.stdout.write(self.style.SUCCESS('Successfully imported business hours data'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error importing business hours data: {e}'))
@@ -62,17 +65,13 @@ class Command(BaseCommand):
         # Import timezone data
         try:
             self.stdout.write('Importing timezone data...')
-            timezone_df = pd.read_csv('timezones.csv')
-            
-            timezone_objects = [
-                StoreTimezone(
-                    store_id=row['store_id'],
-                    timezone_str=row['timezone_str']
-                )
-                for _, row in timezone_df.iterrows()
-            ]
+            with open('timezones.csv', newline='') as f:
+                timezone_objects = [
+                    StoreTimezone(store_id=row['store_id'], timezone_str=row['timezone_str'])
+                    for row in csv.DictReader(f)
+                ]
             
-            StoreTimezone.objects.bulk_create(timezone_objects)
+            StoreTimezone.objects.bulk_create(timezone_objects, batch_size=get_batch_size())
             self.stdout.write(self.style.SUCCESS('Successfully imported timezone data'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error importing timezone data: {e}'))
@@ -81,5 +80,8 @@ class Command(BaseCommand):
     
     def parse_time(self, time_str):
         """Parse time string in HH:MM:SS format."""
-        from datetime import datetime
-        return datetime.strptime(time_str, '%H:%M:%S').time()
\ No newline at end of file
+        return datetime.strptime(time_str, '%H:%M:%S').time()
+    
+    def parse_timestamp(self, timestamp_str):
+        """Parse a UTC timestamp such as '2023-01-22 12:09:39.388884 UTC'."""
+        return parse_utc_timestamp(timestamp_str)
\ No newline at end of file
@@ -0,0 +1,19 @@
+from celery import shared_task
+
+from .models import Report
+from .report_utils import optimize_report_generation
+
+@shared_task(bind=True, max_retries=3)
+def generate_report_task(self, report_id):
+    """
+    Generate a report on a Celery worker, retrying with backoff if it fails.
+    """
+    if optimize_report_generation(report_id):
+        return True
+    
+    if self.request.retries < self.max_retries:
+        # Keep the report visible as running while it is retried
+        Report.objects.filter(id=report_id).update(status=Report.RUNNING)
+        raise self.retry(countdown=30 * 2 ** self.request.retries)
+    
+    return False
@@ -1,3 +1,229 @@
-from django.test import TestCase
+import csv
+import multiprocessing
+import tempfile
+from datetime import datetime, time
+from unittest import mock
 
-# Create your tests here.
+import httplib2
+import pytz
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from googleapiclient.errors import HttpError
+from kombu.exceptions import OperationalError
+
+from .models import StoreStatus, BusinessHours, StoreTimezone, Report
+from .report_utils import calculate_uptime_downtime, load_observations, load_store_metadata
+from .tasks_celery import generate_report_task
+from .utils import upload_with_retry
+
+def utc(*args):
+    return datetime(*args, tzinfo=pytz.UTC)
+
+def http_error(status):
+    return HttpError(httplib2.Response({'status': status}), b'')
+
+class CalculateUptimeDowntimeTests(TestCase):
+    """Pin the uptime/downtime results for fixed observations."""
+
+    def add_store(self, store_id, timezone_str, hours):
+        StoreTimezone.objects.create(store_id=store_id, timezone_str=timezone_str)
+        for day_of_week, start, end in hours:
+            BusinessHours.objects.create(
+                store_id=store_id, day_of_week=day_of_week,
+                start_time_local=start, end_time_local=end)
+
+    def add_observations(self, store_id, observations):
+        StoreStatus.objects.bulk_create([
+            StoreStatus(store_id=store_id, timestamp_utc=timestamp, status=status)
+            for timestamp, status in observations
+        ])
+
+    def assert_uptime_downtime(self, store_id, start_time, end_time, expected):
+        # The database path and the preloaded path must agree
+        uptime, downtime = calculate_uptime_downtime(store_id, start_time, end_time)
+        self.assertAlmostEqual(uptime, expected[0])
+        self.assertAlmostEqual(downtime, expected[1])
+
+        tz_map, bh_map = load_store_metadata()
+        observations = load_observations(start_time, end_time).get(store_id)
+        uptime, downtime = calculate_uptime_downtime(
+            store_id, start_time, end_time, observations, tz_map, bh_map)
+        self.assertAlmostEqual(uptime, expected[0])
+        self.assertAlmostEqual(downtime, expected[1])
+
+    def test_observations_on_interval_edges_are_included(self):
+        # Monday 2023-01-02, 09:00-17:00 UTC
+        self.add_store('edges', 'UTC', [(0, time(9), time(17))])
+        self.add_observations('edges', [
+            (utc(2023, 1, 2, 9), 'active'),
+            (utc(2023, 1, 2, 12), 'inactive'),
+            (utc(2023, 1, 2, 17), 'active'),
+        ])
+        self.assert_uptime_downtime('edges', utc(2023, 1, 2, 8), utc(2023, 1, 2, 18), (180, 300))
+
+    def test_first_and_last_observation_extrapolate_to_edges(self):
+        self.add_store('extrapolate', 'UTC', [(0, time(9), time(17))])
+        self.add_observations('extrapolate', [
+            (utc(2023, 1, 2, 10), 'inactive'),
+            (utc(2023, 1, 2, 16), 'active'),
+        ])
+        # 09-10 lead and 10-16 gap are down, 16-17 tail is up
+        self.assert_uptime_downtime('extrapolate', utc(2023, 1, 2, 8), utc(2023, 1, 2, 18), (60, 420))
+
+    def test_interval_without_observations_counts_as_uptime(self):
+        self.add_store('gap', 'UTC', [(0, time(9), time(12)), (0, time(13), time(17))])
+        self.add_observations('gap', [
+            (utc(2023, 1, 2, 12, 30), 'inactive'),  # outside business hours
+            (utc(2023, 1, 2, 14), 'inactive'),
+        ])
+        # 09-12 has no observations; 13-17 is down throughout
+        self.assert_uptime_downtime('gap', utc(2023, 1, 2, 8), utc(2023, 1, 2, 18), (180, 240))
+
+    def test_business_hours_spanning_midnight(self):
+        # Monday 22:00 to Tuesday 02:00
+        self.add_store('midnight', 'UTC', [(0, time(22), time(2)), (1, time(9), time(17))])
+        self.add_observations('midnight', [
+            (utc(2023, 1, 2, 23), 'inactive'),
+            (utc(2023, 1, 3, 1), 'active'),
+        ])
+        self.assert_uptime_downtime('midnight', utc(2023, 1, 2, 20), utc(2023, 1, 3, 3), (60, 180))
+
+    def test_nonexistent_local_time_moves_forward(self):
+        # 02:30 does not exist on 2023-03-12 in New York; it is read as 02:30 EST (07:30 UTC)
+        self.add_store('spring', 'America/New_York', [(6, time(2, 30), time(4))])
+        self.assert_uptime_downtime('spring', utc(2023, 3, 12, 6), utc(2023, 3, 12, 12), (30, 0))
+
+    def test_ambiguous_local_time_uses_standard_time(self):
+        # 01:30 happens twice on 2023-11-05 in New York; the EST one (06:30 UTC) is used
+        self.add_store('fall', 'America/New_York', [(6, time(1, 30), time(3))])
+        self.assert_uptime_downtime('fall', utc(2023, 11, 5, 5), utc(2023, 11, 5, 12), (90, 0))
+
+@mock.patch('monitoring.utils.upload_to_google_drive', return_value='https://drive.google.com/file/d/report/view')
+class GenerateReportTaskTests(TestCase):
+    """Run the whole report path through the Celery task."""
+
+    def setUp(self):
+        report_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(report_dir.cleanup)
+        settings_override = override_settings(REPORT_DIR=report_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        StoreTimezone.objects.create(store_id='store', timezone_str='UTC')
+        StoreStatus.objects.bulk_create([
+            StoreStatus(store_id='store', timestamp_utc=utc(2023, 1, 2, 10), status='inactive'),
+            StoreStatus(store_id='store', timestamp_utc=utc(2023, 1, 2, 12), status='active'),
+        ])
+        self.report = Report.objects.create()
+
+    def run_report(self):
+        result = generate_report_task.apply(args=[str(self.report.id)])
+        self.assertIs(result.get(), True)
+
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.status, Report.COMPLETE)
+        self.assertEqual(self.report.google_drive_link, 'https://drive.google.com/file/d/report/view')
+        with open(self.report.file_path, newline='') as report_file:
+            return list(csv.DictReader(report_file))
+
+    def assert_report_rows(self, rows):
+        self.maxDiff = None
+        # 24/7 store, down from midnight until the active observation at 12:00
+        self.assertEqual(rows, [{
+            'store_id': 'store',
+            'uptime_last_hour': '60.0',
+            'uptime_last_day': '12.0',
+            'uptime_last_week': '156.0',
+            'downtime_last_hour': '0.0',
+            'downtime_last_day': '12.0',
+            'downtime_last_week': '12.0',
+        }])
+
+    def test_report_in_process_pool(self, upload):
+        self.assert_report_rows(self.run_report())
+        upload.assert_called_once()
+
+    def test_report_in_spawned_process_pool(self, upload):
+        # spawn is the default start method on macOS and Windows
+        start_method = multiprocessing.get_start_method()
+        multiprocessing.set_start_method('spawn', force=True)
+        self.addCleanup(multiprocessing.set_start_method, start_method, force=True)
+
+        self.assert_report_rows(self.run_report())
+        upload.assert_called_once()
+
+    def test_worker_runs_tasks_in_main_process(self, upload):
+        # Only a non-forking pool lets the report start its own process pool
+        from store_monitoring.celery import app
+        self.assertEqual(app.conf.worker_pool, 'solo')
+
+    def test_report_in_daemonic_worker(self, upload):
+        # Celery prefork workers are daemonic and cannot start a process pool
+        process = multiprocessing.current_process()
+        process.daemon = True
+        self.addCleanup(setattr, process, 'daemon', False)
+
+        self.assert_report_rows(self.run_report())
+        upload.assert_called_once()
+
+class TriggerReportTests(TestCase):
+
+    @mock.patch.object(generate_report_task, 'delay')
+    def test_report_is_queued(self, delay):
+        response = self.client.post(reverse('trigger_report'))
+
+        self.assertEqual(response.status_code, 202)
+        report = Report.objects.get()
+        self.assertEqual(report.status, Report.RUNNING)
+        delay.assert_called_once_with(str(report.id))
+
+    @mock.patch.object(generate_report_task, 'delay', side_effect=OperationalError('broker unreachable'))
+    def test_report_fails_when_broker_is_unreachable(self, delay):
+        response = self.client.post(reverse('trigger_report'))
+
+        self.assertEqual(response.status_code, 503)
+        report = Report.objects.get()
+        self.assertEqual(report.status, Report.FAILED)
+        self.assertEqual(self.client.get(reverse('get_report', args=[report.id])).json()['status'], 'Failed')
+
+@mock.patch('monitoring.utils.time.sleep')
+@mock.patch('monitoring.utils.get_drive_client')
+class UploadWithRetryTests(TestCase):
+    file = {'id': 'file-id', 'link': 'https://drive.google.com/file/d/file-id/view'}
+
+    def assert_backoff(self, sleep, *base_delays):
+        # Each delay is 2 ** attempt seconds with +/-20% jitter
+        self.assertEqual(sleep.call_count, len(base_delays))
+        for call, base_delay in zip(sleep.call_args_list, base_delays):
+            self.assertGreaterEqual(call.args[0], base_delay * 0.8)
+            self.assertLessEqual(call.args[0], base_delay * 1.2)
+
+    def test_server_error_is_retried_until_a_client_error(self, get_drive_client, sleep):
+        drive_client = get_drive_client.return_value
+        drive_client.create_file.side_effect = [http_error(503), http_error(404)]
+
+        self.assertIsNone(upload_with_retry('report.csv', 'report.csv'))
+
+        self.assertEqual(drive_client.create_file.call_count, 2)
+        drive_client.share_file.assert_not_called()
+        self.assert_backoff(sleep, 1)
+
+    def test_server_errors_give_up_after_max_retries(self, get_drive_client, sleep):
+        drive_client = get_drive_client.return_value
+        drive_client.create_file.side_effect = http_error(503)
+
+        self.assertIsNone(upload_with_retry('report.csv', 'report.csv', max_retries=3))
+
+        self.assertEqual(drive_client.create_file.call_count, 3)
+        self.assert_backoff(sleep, 1, 2)
+
+    def test_failed_share_does_not_upload_again(self, get_drive_client, sleep):
+        drive_client = get_drive_client.return_value
+        drive_client.create_file.return_value = self.file
+        drive_client.share_file.side_effect = [http_error(503), {'id': 'permission-id'}]
+
+        self.assertEqual(upload_with_retry('report.csv', 'report.csv'), self.file['link'])
+
+        drive_client.create_file.assert_called_once()
+        self.assertEqual(drive_client.share_file.call_args_list, [mock.call('file-id')] * 2)
+        self.assert_backoff(sleep, 1)
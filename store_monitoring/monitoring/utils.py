@@ -2,29 +2,39 @@ import pandas as pd
 import pytz
 from datetime import datetime, timedelta
 import os
-import threading
+import random
+import time
 from django.utils import timezone
 from django.db.models import Max
+from googleapiclient.errors import HttpError
 
 from .models import StoreStatus, BusinessHours, StoreTimezone, Report
-from .google_drive import GoogleDriveClient
-from .report_utils import optimize_report_generation
+from .google_drive import get_drive_client
+from .tasks_celery import generate_report_task
+
+# Drive errors worth retrying: rate limiting and server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRY_SLEEP = 30
 
 def generate_report(report_id):
     """
-    Start report generation in a background thread.
+    Queue report generation on a Celery worker.
+    Returns False and marks the report failed if the task cannot be queued,
+    e.g. because the broker is unreachable.
     """
-    # Run report generation in a background thread
-    thread = threading.Thread(target=optimize_report_generation, args=(report_id,))
-    thread.daemon = True
-    thread.start()
+    try:
+        generate_report_task.delay(str(report_id))
+        return True
+    except Exception as e:
+        print(f"Error queueing report {report_id}: {e}")
+        Report.objects.filter(id=report_id).update(status=Report.FAILED)
+        return False
 
 def upload_to_google_drive(file_path, file_name):
     """
-    Upload a file to Google Drive using our GoogleDriveClient.
+    Upload a file to Google Drive using the shared GoogleDriveClient.
     """
-    # Create a Google Drive client
-    drive_client = GoogleDriveClient()
+    drive_client = get_drive_client()
     
     # Upload the file
     result = drive_client.upload_file(file_path, file_name, mime_type='text/csv')
@@ -44,19 +54,40 @@ def get_current_timestamp():
     return timezone.now()
 
 # Retry mechanism for uploading to Google Drive
-def upload_with_retry(file_path, file_name, max_retries=3):
+def call_with_retry(request, max_retries=3):
     """
-    Upload a file to Google Drive with retry logic.
+    Call request() and return its result, retrying rate limiting (429) and
+    server errors (5xx) with backoff. Any other HttpError, or the last
+    retryable one, is raised.
     """
     for attempt in range(max_retries):
         try:
-            link = upload_to_google_drive(file_path, file_name)
-            if link:
-                return link
-        except Exception as e:
-            print(f"Upload attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                # Wait a bit before retrying (exponential backoff)
-                time.sleep(2 ** attempt)
+            return request()
+        except HttpError as e:
+            if e.resp.status not in RETRYABLE_STATUS_CODES or attempt == max_retries - 1:
+                raise
+            print(f"Drive request attempt {attempt + 1} failed: {e}")
+        
+        # Capped exponential backoff with jitter so retries don't arrive in lockstep
+        time.sleep(min(MAX_RETRY_SLEEP, 2 ** attempt) * random.uniform(0.8, 1.2))
+
+def upload_with_retry(file_path, file_name, max_retries=3):
+    """
+    Upload a file to Google Drive with retry logic.
+    The upload and the sharing step are retried separately, so a failed
+    permission call never uploads the file a second time.
+    """
+    drive_client = get_drive_client()
+    
+    try:
+        file = call_with_retry(
+            lambda: drive_client.create_file(file_path, file_name, mime_type='text/csv'), max_retries)
+        if not file:
+            return None
+        
+        call_with_retry(lambda: drive_client.share_file(file['id']), max_retries)
+        return file['link']
     
-    return None
\ No newline at end of file
+    except Exception as e:
+        print(f"Upload failed: {e}")
+        return None
\ No newline at end of file
@@ -2,7 +2,6 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.http import HttpResponse
-import threading
 import os
 
 from .models import Report
@@ -14,8 +13,10 @@ def trigger_report(request):
     # Create a new report object
     report = Report.objects.create()
     
-    # Start report generation in background
-    threading.Thread(target=generate_report, args=(report.id,)).start()
+    # Queue report generation on a Celery worker
+    if not generate_report(report.id):
+        return Response({'report_id': report.id, 'status': 'Failed', 'error': 'Could not queue report generation'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
     
     return Response({'report_id': report.id}, status=status.HTTP_202_ACCEPTED)
 
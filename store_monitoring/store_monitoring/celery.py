@@ -0,0 +1,18 @@
+"""
+Celery config for store_monitoring project.
+
+Start a worker with:
+    celery -A store_monitoring worker -l info
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'store_monitoring.settings')
+
+app = Celery('store_monitoring')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# monitoring.tasks holds the legacy import command, so tasks live in tasks_celery
+app.autodiscover_tasks(related_name='tasks_celery')
@@ -65,6 +65,19 @@ DATABASES = {
     }
 }
 
+# The StoreStatus covering index falls back to a plain index on SQLite
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_TASK_ACKS_LATE = True
+# With late acks, Redis redelivers any task not acked within the visibility
+# timeout (1 hour by default), so it must outlast the longest report
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 12 * 60 * 60}
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# Prefork children are daemonic and cannot start the report's process pool,
+# so tasks run in the worker's main process, one report at a time
+CELERY_WORKER_POOL = 'solo'
+
 REST_FRAMEWORK = {
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',